@@ -1,24 +1,113 @@
+import asyncio
+import calendar
 import datetime
-import math
+import functools
+import json
 import os
 import logging
-import tweepy
-import google.generativeai as genai
-from dotenv import load_dotenv
+import re
+import shelve
+import tempfile
+import time
+from typing import TYPE_CHECKING, Optional
+
+# tweepy / requests は import が重いため、使用する関数の中で import する
+# (APIキー不足で即終了する場合や、計算処理だけを使う場合に読み込みを省く)
+if TYPE_CHECKING:
+    import requests
+    import tweepy
 
 # --- 定数 ---
 PROGRESS_BAR_WIDTH = 12
 FILLED_SYMBOL = "🟩"
 EMPTY_SYMBOL = "□"
 DEFAULT_SENTENCE = "何もしないままでいいのか？"
+# 生成文の先頭から取り除く箇条書き記号
+_BULLET_PREFIXES = ("*", "・", "-")
+TWEET_BANNER = "=" * 30
+JST = datetime.timezone(datetime.timedelta(hours=9))
+WEEKDAYS_JP = ("月", "火", "水", "木", "金", "土", "日") # datetime.weekday() の順 (月曜始まり)
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+# SDK (google-generativeai) は import が重いため、REST API を直接呼び出す (SSE でストリーミング受信)
+GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL_NAME}:streamGenerateContent"
+# 毎回変わらない指示はシステム指示としてプロンプトの先頭に置く (暗黙的キャッシュが効きやすくなる)
+GEMINI_SYSTEM_INSTRUCTION = " ".join([
+    "必ず1つの文章で、箇条書きや複数行は使わないでください。",
+    "敬語を使い、ですます調でエンジニアのマインドを発信してください",
+    "句読点を含めて全体で40文字以内が望ましいですが、言葉が溢れるなら多少の調整は許容します。",
+])
+# 出力は40文字程度の1文なので、生成トークン数に上限を設けて余計なデコードを避ける
+GEMINI_GENERATION_CONFIG = {
+    "maxOutputTokens": 64,
+    "temperature": 0.9,
+    "topP": 0.9,
+    "candidateCount": 1,
+}
+# Gemini API 呼び出しのタイムアウトと再試行 (一時的なエラーのみ、指数バックオフ)
+GEMINI_TIMEOUT_SECONDS = 8
+GEMINI_MAX_ATTEMPTS = 3
+GEMINI_RETRY_BASE_DELAY_SECONDS = 0.2
+GEMINI_RETRYABLE_STATUS_CODES = (500, 502, 503, 504)
+X_API_HOST = "https://api.twitter.com"
+X_WARMUP_TIMEOUT_SECONDS = 5
+X_POOL_MAXSIZE = 4
+# 生成済みの文章を保存するキャッシュ (同じ日の再実行では Gemini API を呼ばない)
+SENTENCE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "chrona_gemini")
+# X API のレート制限に達した際の解除時刻 (UNIX 時間) を保存するファイル
+RATE_LIMIT_STATE_PATH = os.path.join(tempfile.gettempdir(), "chrona_rate.json")
+# レート制限の枠ごとのヘッダー接頭辞 (15分枠、ユーザー単位の24時間枠、アプリ単位の24時間枠)。
+# 各枠に "-remaining" (残り回数) と "-reset" (解除時刻) のヘッダーがある。
+RATE_LIMIT_HEADER_PREFIXES = ("x-rate-limit", "x-user-limit-24hour", "x-app-limit-24hour")
+
+# 塗りつぶし幅 0 から PROGRESS_BAR_WIDTH までのバー本体 (インデックス = 塗りつぶし幅)。
+# 取り得る形は PROGRESS_BAR_WIDTH + 1 通りしかないため、読み込み時にすべて作っておく。
+_BAR_BODIES = tuple(
+    FILLED_SYMBOL * i + EMPTY_SYMBOL * (PROGRESS_BAR_WIDTH - i)
+    for i in range(PROGRESS_BAR_WIDTH + 1)
+)
+# 0% / 100% (年始・年末) のプログレスバーは完成形の文字列をそのまま返す
+_EMPTY_BAR = f"[{_BAR_BODIES[0]}] 0%"
+_FULL_BAR = f"[{_BAR_BODIES[PROGRESS_BAR_WIDTH]}] 100%"
 
 # --- ロギング設定 ---
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger("chrona")
 
 # --- 環境変数読み込み ---
 # ローカル開発環境(.envファイル)とGitHub ActionsのSecretsの両方に対応
-load_dotenv()
+ENV_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+
+def _load_env_file(path: str) -> None:
+    """.env ファイルを読み込み、未設定の環境変数だけを設定します (python-dotenv の簡易版)。
+
+    Args:
+        path: .env ファイルのパス。
+    """
+    with open(path, encoding="utf-8") as env_file:
+        for line in env_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("export "):
+                line = line[len("export "):]
+            key, sep, value = line.partition("=")
+            if not sep:
+                continue
+            value = value.strip()
+            closing_quote = value.find(value[0], 1) if value[:1] in ("'", '"') else -1
+            if closing_quote != -1:
+                # 引用符で囲まれた値は閉じ引用符までを値とし、以降 (行末コメントなど) は無視する
+                value = value[1:closing_quote]
+            else:
+                # 引用符で囲まれていない値は行末コメント (空白に続く "#" 以降) を取り除く
+                value = re.split(r"(?:^|\s)#", value, maxsplit=1)[0].rstrip()
+            # 既に設定されている環境変数 (Secrets など) を優先する
+            os.environ.setdefault(key.strip(), value)
+
+# GitHub Actions では Secrets が環境変数として渡されるため .env は読まない
+if not os.getenv("GITHUB_ACTIONS") and os.path.exists(ENV_FILE_PATH):
+    _load_env_file(ENV_FILE_PATH)
 
 # --- APIキーの取得 ---
 # 環境変数から取得できなかった場合はNoneが入る
@@ -29,6 +118,9 @@ X_ACCESS_TOKEN = os.getenv("X_ACCESS_TOKEN")
 X_ACCESS_TOKEN_SECRET = os.getenv("X_ACCESS_TOKEN_SECRET")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# --- Gemini API 用 HTTP セッション (初回呼び出し時に生成し、以降は TLS 接続ごと使い回す) ---
+_GEMINI_SESSION = None
+
 # --- 関数 ---
 
 def get_year_progress(target_date: datetime.date) -> tuple[int, int, float]:
@@ -43,15 +135,10 @@ def get_year_progress(target_date: datetime.date) -> tuple[int, int, float]:
         - total_days_in_year: その年の総日数。
         - progress_percentage: 年の経過率 (%) (0.0 から 100.0)。
     """
-    year = target_date.year
-    start_of_year = datetime.date(year, 1, 1)
-    end_of_year = datetime.date(year, 12, 31)
-    total_days_in_year = (end_of_year - start_of_year).days + 1
-    current_day_of_year = (target_date - start_of_year).days + 1
-    # ゼロ除算を避ける (念のため)
-    if total_days_in_year == 0:
-        return current_day_of_year, total_days_in_year, 0.0
-    progress_percentage = (current_day_of_year / total_days_in_year) * 100.0
+    # 日付オブジェクトの生成や引き算をせず、年内通算日と閏年判定から直接求める
+    current_day_of_year = target_date.timetuple().tm_yday
+    total_days_in_year = 366 if calendar.isleap(target_date.year) else 365
+    progress_percentage = current_day_of_year * 100.0 / total_days_in_year
     return current_day_of_year, total_days_in_year, progress_percentage
 
 def create_progress_bar(percentage: float) -> str:
@@ -63,21 +150,153 @@ def create_progress_bar(percentage: float) -> str:
     Returns:
         プログレスバーを表す文字列 (例: "[🟩🟩🟩⬜⬜⬜⬜⬜⬜⬜] 27%")。
     """
-    # パーセンテージが0未満または100超の場合は丸める
-    percentage = max(0.0, min(100.0, percentage))
+    # パーセンテージが0以下または100以上の場合は端の値として扱う
+    if percentage <= 0.0:
+        return _EMPTY_BAR
+    if percentage >= 100.0:
+        return _FULL_BAR
 
     # 新しい仕様: 進行率 / 10 の切り捨てで本数を決定
-    if percentage == 100.0:
-        filled_width = PROGRESS_BAR_WIDTH
-    else:
-        filled_width = math.floor(percentage / (100 / PROGRESS_BAR_WIDTH))
+    filled_width = int(percentage * PROGRESS_BAR_WIDTH) // 100
 
-    empty_width = PROGRESS_BAR_WIDTH - filled_width
-    bar = FILLED_SYMBOL * filled_width + EMPTY_SYMBOL * empty_width
     # %.0f で整数表示 (これは元々四捨五入)
-    return f"[{bar}] {percentage:.0f}%"
+    return f"[{_BAR_BODIES[filled_width]}] {percentage:.0f}%"
+
+def _load_cached_sentence(cache_key: str) -> Optional[str]:
+    """キャッシュから生成済みの文章を取得します。
+
+    Args:
+        cache_key: 経過日数・総日数・経過率から作るキャッシュキー。
+
+    Returns:
+        キャッシュ済みの文章。存在しない場合や読み込みに失敗した場合は None。
+    """
+    try:
+        with shelve.open(SENTENCE_CACHE_PATH, flag="r") as cache:
+            return cache.get(cache_key)
+    except Exception:
+        # キャッシュファイルが未作成の場合もここに来る
+        return None
+
+def _store_cached_sentence(cache_key: str, sentence: str) -> None:
+    """生成した文章をキャッシュに保存します。
+       キャッシュは最新の1件のみ保持し、前日以前のエントリは破棄します。
+
+    Args:
+        cache_key: 経過日数・総日数・経過率から作るキャッシュキー。
+        sentence: 保存する文章。
+    """
+    try:
+        os.makedirs(os.path.dirname(SENTENCE_CACHE_PATH), exist_ok=True)
+        with shelve.open(SENTENCE_CACHE_PATH) as cache:
+            cache.clear()
+            cache[cache_key] = sentence
+    except Exception as e:
+        logger.warning("文章のキャッシュ保存に失敗しました: %s", e)
+
+def _get_gemini_session() -> "requests.Session":
+    """Gemini API 用の HTTP セッションを取得します。初回のみセッションを生成します。
+
+    Returns:
+        生成済みの requests.Session。
+    """
+    global _GEMINI_SESSION
+    if _GEMINI_SESSION is None:
+        import requests
+        _GEMINI_SESSION = requests.Session()
+    return _GEMINI_SESSION
+
+def _is_retryable_gemini_error(error: Exception) -> bool:
+    """Gemini API のエラーが再試行で回復し得る一時的なものかを判定します。
+
+    Args:
+        error: 発生した例外。
+
+    Returns:
+        タイムアウト・接続エラー・サーバー側エラー (5xx) の場合は True。
+    """
+    import requests
+
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in GEMINI_RETRYABLE_STATUS_CODES
+    return False
+
+def _stream_generate_content(api_key: str, prompt: str) -> tuple[str, Optional[str]]:
+    """Gemini API (streamGenerateContent) を呼び出し、生成されたテキストを返します。
+       応答は届いた分から順に連結し、最初の1行が揃った時点で受信を打ち切ります。
 
-def generate_sentence(api_key: str, current_day_of_year: int, total_days_in_year: int, progress_percentage: float) -> str:
+    Args:
+        api_key: Google Gemini API キー。
+        prompt: 送信するプロンプト。
+
+    Returns:
+        以下の要素を含むタプル:
+        - 生成されたテキスト (途中で打ち切った場合は2行目の途中まで)。
+        - 生成の終了理由 (finishReason、例: "STOP", "MAX_TOKENS")。届かなかった場合は None。
+
+    Raises:
+        requests.RequestException: 通信エラー、またはエラーレスポンスの場合。
+    """
+    payload = {
+        "systemInstruction": {"parts": [{"text": GEMINI_SYSTEM_INSTRUCTION}]},
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": GEMINI_GENERATION_CONFIG,
+    }
+    text = ""
+    finish_reason = None
+    # API キーは URL に含めずヘッダーで渡す (エラーログに残さないため)
+    with _get_gemini_session().post(
+        GEMINI_API_URL,
+        params={"alt": "sse"},
+        headers={"x-goog-api-key": api_key},
+        json=payload,
+        timeout=GEMINI_TIMEOUT_SECONDS,
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            # Server-Sent Events: 生成結果は "data: {...}" 形式の行で少しずつ届く
+            if not line.startswith(b"data:"):
+                continue
+            chunk = json.loads(line[len(b"data:"):])
+            for candidate in chunk.get("candidates", []):
+                for part in candidate.get("content", {}).get("parts", []):
+                    text += part.get("text", "")
+                # 終了理由は最後のチャンクにだけ含まれる
+                finish_reason = candidate.get("finishReason", finish_reason)
+            # 使うのは最初の1行だけなので、改行が届いたら残りは受信しない
+            if "\n" in text.lstrip():
+                break
+    return text, finish_reason
+
+async def _generate_content_with_retry(api_key: str, prompt: str) -> tuple[str, Optional[str]]:
+    """タイムアウト付きで Gemini API を呼び出し、一時的なエラーの場合は指数バックオフで再試行します。
+
+    Args:
+        api_key: Google Gemini API キー。
+        prompt: 送信するプロンプト。
+
+    Returns:
+        生成されたテキストと、生成の終了理由 (finishReason) のタプル。
+
+    Raises:
+        requests.RequestException: 再試行できないエラー、または最大試行回数に達しても成功しなかった場合。
+    """
+    import requests
+
+    for attempt in range(1, GEMINI_MAX_ATTEMPTS + 1):
+        try:
+            return await asyncio.to_thread(_stream_generate_content, api_key, prompt)
+        except requests.RequestException as e:
+            if attempt == GEMINI_MAX_ATTEMPTS or not _is_retryable_gemini_error(e):
+                raise
+            delay = GEMINI_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)
+            logger.warning("Gemini API 一時エラー (%d/%d回目): %s。%.1f秒後に再試行します。", attempt, GEMINI_MAX_ATTEMPTS, e, delay)
+            await asyncio.sleep(delay)
+
+async def generate_sentence(api_key: str, current_day_of_year: int, total_days_in_year: int, progress_percentage: float) -> str:
     """Google Gemini API を使用して、示唆に富んだ一文を生成します。
        日付と進行度からAIが自由に連想し、毎回異なる表現を目指します。
 
@@ -88,153 +307,234 @@ def generate_sentence(api_key: str, current_day_of_year: int, total_days_in_year
         progress_percentage: 年の経過率 (%)。
 
     Returns:
-        生成された一文。エラー時はデフォルトの文章を返す。
+        生成された一文。同じ日の再実行ではキャッシュ済みの文章を返す。エラー時はデフォルトの文章を返す。
     """
+    cache_key = f"{current_day_of_year}:{total_days_in_year}:{progress_percentage:.1f}"
+    cached_sentence = _load_cached_sentence(cache_key)
+    if cached_sentence:
+        logger.info("キャッシュ済みの文章を使用します (Gemini API 呼び出しを省略)。")
+        return cached_sentence
+
     if not api_key:
-        logging.error("Gemini APIキーが設定されていません。")
+        logger.error("Gemini APIキーが設定されていません。")
         return DEFAULT_SENTENCE
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        # プロンプト本体: 事実を伝え、AIの自由な解釈に委ねる
-        prompt_parts = [
-            f"今日は1年{total_days_in_year}日のうち{current_day_of_year}日目、{progress_percentage:.1f}%が経過しました。",
-            "必ず1つの文章で、箇条書きや複数行は使わないでください。",
-            "敬語を使い、ですます調でエンジニアのマインドを発信してください",
-            "句読点を含めて全体で40文字以内が望ましいですが、言葉が溢れるなら多少の調整は許容します。",
-        ]
-        prompt = " ".join(prompt_parts)
-
-        logging.info(f"Gemini API 呼び出し開始 (プロンプトヒント: 「今日は1年{total_days_in_year}日のうち{current_day_of_year}日目...」)")
-        response = model.generate_content(prompt)
-        logging.info("Gemini API 呼び出し成功.")
-        generated_text = response.text.strip()
-
-        if generated_text and "\\n" not in generated_text:
-             if generated_text.startswith("*") or generated_text.startswith("・") or generated_text.startswith("-"):
-                 generated_text = generated_text[1:].strip()
-             return generated_text
-        elif generated_text and "\\n" in generated_text: # 複数行の場合
-             logging.warning(f"Gemini APIから複数行の応答がありました: {generated_text.splitlines()[0]} ...。最初の行を使用します。")
-             first_line = generated_text.splitlines()[0].strip()
-             if first_line.startswith("*") or first_line.startswith("・") or first_line.startswith("-"):
-                 first_line = first_line[1:].strip()
-             return first_line
-        else: # 空の場合
-             logging.warning("Gemini APIから空の応答がありました。デフォルトの文章を使用します。")
+        # プロンプト本体: 事実だけを伝え、AIの自由な解釈に委ねる (書き方の指示はシステム指示側)
+        prompt = f"今日は1年{total_days_in_year}日のうち{current_day_of_year}日目、{progress_percentage:.1f}%が経過しました。"
+
+        logger.info("Gemini API 呼び出し開始 (プロンプトヒント: 「今日は1年%d日のうち%d日目...」)", total_days_in_year, current_day_of_year)
+        generated_text, finish_reason = await _generate_content_with_retry(api_key, prompt)
+        logger.info("Gemini API 呼び出し成功.")
+
+        # 1回の走査で複数行かどうかの判定と最初の行の切り出しを行う
+        sentence, newline, _ = generated_text.strip().partition("\n")
+        if finish_reason == "MAX_TOKENS" and not newline:
+             # 出力トークン数の上限で途中で切れた文章は投稿もキャッシュもしない
+             logger.warning("Gemini APIの応答が出力トークン数の上限で途中終了しました: %s ...。デフォルトの文章を使用します。", sentence)
+             return DEFAULT_SENTENCE
+        if newline: # 複数行の場合
+             logger.warning("Gemini APIから複数行の応答がありました: %s ...。最初の行を使用します。", sentence)
+        sentence = sentence.strip()
+        if sentence.startswith(_BULLET_PREFIXES):
+             sentence = sentence[1:].strip()
+        if not sentence: # 空の場合
+             logger.warning("Gemini APIから空の応答がありました。デフォルトの文章を使用します。")
              return DEFAULT_SENTENCE
 
+        _store_cached_sentence(cache_key, sentence)
+        return sentence
+
     except Exception as e:
-        logging.error(f"Gemini APIエラー: {e}")
+        logger.error("Gemini APIエラー: %s", e)
         return DEFAULT_SENTENCE
 
-def post_tweet(api_key: str, api_secret: str, access_token: str, access_token_secret: str, text: str) -> bool:
-    """X (Twitter) API v2 (User Context認証) を使用してツイートを投稿します。
+@functools.lru_cache(maxsize=1)
+def get_tweet_client(api_key: str, api_secret: str, access_token: str, access_token_secret: str) -> "tweepy.Client":
+    """X (Twitter) API v2 (User Context認証) 用の Tweepy Client を作成します。
+       同じ認証情報での呼び出しには作成済みの Client を返し、HTTPS 接続を使い回します。
+       投稿時のTLSハンドシェイクを省くため、作成時にAPIホストへの接続を確立しておきます。
 
     Args:
         api_key: X API Key (Consumer Key).
         api_secret: X API Key Secret (Consumer Secret).
         access_token: X Access Token.
         access_token_secret: X Access Token Secret.
+
+    Returns:
+        初期化済みの tweepy.Client。
+    """
+    import tweepy
+    from requests.adapters import HTTPAdapter
+
+    # TweepyのClient初期化 (OAuth 1.0a User Context)
+    client = tweepy.Client(
+        consumer_key=api_key,
+        consumer_secret=api_secret,
+        access_token=access_token,
+        access_token_secret=access_token_secret
+    )
+    # X API ホストへの接続をプールして使い回す
+    client.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=X_POOL_MAXSIZE))
+    # 接続のウォームアップ (APIのレート制限を消費しないHEADリクエスト)
+    try:
+        client.session.head(X_API_HOST, timeout=X_WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("X API への事前接続に失敗しました (投稿時に再接続します): %s", e)
+    return client
+
+def _load_rate_limit_reset() -> Optional[int]:
+    """前回レート制限に達した際に保存した解除時刻を取得します。
+
+    Returns:
+        解除時刻 (UNIX 時間)。保存されていない場合や読み込みに失敗した場合は None。
+    """
+    try:
+        with open(RATE_LIMIT_STATE_PATH, encoding="utf-8") as state_file:
+            return int(json.load(state_file)["reset"])
+    except Exception:
+        return None
+
+def _store_rate_limit_reset(response: "requests.Response") -> None:
+    """レート制限エラーのレスポンスヘッダーから解除時刻を読み取り、保存します。
+
+    Args:
+        response: X API のエラーレスポンス (429 Too Many Requests)。
+    """
+    resets = {}
+    exhausted_resets = []
+    for prefix in RATE_LIMIT_HEADER_PREFIXES:
+        reset = response.headers.get(f"{prefix}-reset", "")
+        if not reset.isdigit():
+            continue
+        resets[prefix] = int(reset)
+        # 残り回数が 0 の枠が、実際に使い切ったレート制限
+        if response.headers.get(f"{prefix}-remaining") == "0":
+            exhausted_resets.append(int(reset))
+    if not resets:
+        return
+    # 使い切った枠が分からない場合は、ヘッダーにある中で最も遅い解除時刻を使う
+    reset_at = max(exhausted_resets) if exhausted_resets else max(resets.values())
+    try:
+        with open(RATE_LIMIT_STATE_PATH, "w", encoding="utf-8") as state_file:
+            json.dump({"reset": reset_at}, state_file)
+    except Exception as e:
+        logger.warning("レート制限の解除時刻の保存に失敗しました: %s", e)
+
+def post_tweet(client: "tweepy.Client", text: str) -> bool:
+    """X (Twitter) API v2 (User Context認証) を使用してツイートを投稿します。
+
+    Args:
+        client: get_tweet_client で作成した tweepy.Client。
         text: 投稿するツイート本文。
 
     Returns:
         投稿が成功した場合は True、失敗した場合は False。
     """
-    # 必要なキーが揃っているかチェック
-    if not all([api_key, api_secret, access_token, access_token_secret]):
-        logging.error("X APIの認証情報 (API Key/Secret, Access Token/Secret) が不足しています。")
-        return False
+    import tweepy
 
     try:
-        # TweepyのClient初期化 (OAuth 1.0a User Context)
-        client = tweepy.Client(
-            consumer_key=api_key,
-            consumer_secret=api_secret,
-            access_token=access_token,
-            access_token_secret=access_token_secret
-        )
-        logging.info("X API 呼び出し開始 (ツイート投稿)...")
+        logger.info("X API 呼び出し開始 (ツイート投稿)...")
         response = client.create_tweet(text=text)
-        logging.info(f"ツイート投稿成功: {response.data['id']}")
+        logger.info("ツイート投稿成功: %s", response.data['id'])
         return True
     except tweepy.errors.TweepyException as e:
-        logging.error(f"X API (Tweepy) エラー: {e}")
+        logger.error("X API (Tweepy) エラー: %s", e)
         # エラーレスポンスの詳細もログに出力してみる
         if hasattr(e, 'api_codes') and hasattr(e, 'api_messages'):
-            logging.error(f"APIエラーコード: {e.api_codes}, メッセージ: {e.api_messages}")
+            logger.error("APIエラーコード: %s, メッセージ: %s", e.api_codes, e.api_messages)
         if hasattr(e, 'response') and e.response is not None:
-            logging.error(f"APIレスポンス: {e.response.text}")
+            logger.error("APIレスポンス: %s", e.response.text)
+            # レート制限の場合は解除時刻を保存し、次回実行時に無駄な API 呼び出しを省く
+            if isinstance(e, tweepy.errors.TooManyRequests):
+                _store_rate_limit_reset(e.response)
         return False
     except Exception as e:
-        logging.error(f"予期せぬエラー (ツイート投稿時): {e}")
+        logger.error("予期せぬエラー (ツイート投稿時): %s", e)
         return False
 
+async def prepare_sentence_and_client(day_num: int, total_days: int, percent: float) -> tuple[str, "tweepy.Client"]:
+    """Gemini API による文章生成と Tweepy Client の準備を並行して行います。
+
+    Args:
+        day_num: 年の開始からの経過日数。
+        total_days: その年の総日数。
+        percent: 年の経過率 (%)。
+
+    Returns:
+        生成された一文と、初期化済みの tweepy.Client のタプル。
+    """
+    sentence, client = await asyncio.gather(
+        generate_sentence(GEMINI_API_KEY, day_num, total_days, percent),
+        asyncio.to_thread(get_tweet_client, X_API_KEY, X_API_SECRET, X_ACCESS_TOKEN, X_ACCESS_TOKEN_SECRET),
+    )
+    return sentence, client
+
 # --- メイン処理 ---
 if __name__ == "__main__":
-    logging.info("Chrona Bot 処理開始...")
+    logger.info("Chrona Bot 処理開始...")
 
     # APIキーの存在チェック (投稿に必要なキーをチェック)
-    required_keys = [X_API_KEY, X_API_SECRET, X_ACCESS_TOKEN, X_ACCESS_TOKEN_SECRET, GEMINI_API_KEY]
-    if not all(required_keys):
+    # 不足しているキーの一覧はエラー時にだけ作る
+    if not (X_API_KEY and X_API_SECRET and X_ACCESS_TOKEN and X_ACCESS_TOKEN_SECRET and GEMINI_API_KEY):
         missing_keys = []
         if not X_API_KEY: missing_keys.append("X_API_KEY")
         if not X_API_SECRET: missing_keys.append("X_API_SECRET")
         if not X_ACCESS_TOKEN: missing_keys.append("X_ACCESS_TOKEN")
         if not X_ACCESS_TOKEN_SECRET: missing_keys.append("X_ACCESS_TOKEN_SECRET")
         if not GEMINI_API_KEY: missing_keys.append("GEMINI_API_KEY")
-        logging.critical(f"必要なAPIキー ({', '.join(missing_keys)}) が環境変数に設定されていません。処理を中断します。")
+        logger.critical("必要なAPIキー (%s) が環境変数に設定されていません。処理を中断します。", ", ".join(missing_keys))
+        exit(1) # エラー終了
+
+    # 前回の実行でレート制限に達していた場合は、解除されるまで Gemini API も呼ばずに終了
+    rate_limit_reset = _load_rate_limit_reset()
+    if rate_limit_reset is not None and rate_limit_reset > time.time():
+        reset_jst = datetime.datetime.fromtimestamp(rate_limit_reset, JST)
+        logger.error("X API のレート制限中のため処理を中断します (解除予定: %s JST)。", reset_jst.strftime('%Y-%m-%d %H:%M:%S'))
         exit(1) # エラー終了
 
     # 1. 年の進行状況を計算
-    now_jst = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9))) # JSTで現在日時を取得
+    now_jst = datetime.datetime.now(JST) # JSTで現在日時を取得
     today_jst = now_jst.date() # 日付部分
-    logging.info(f"対象日時: {now_jst.strftime('%Y-%m-%d %H:%M:%S %Z')} (JST)")
+    logger.info("対象日時: %s (JST)", now_jst.strftime('%Y-%m-%d %H:%M:%S %Z'))
     day_num, total_days, percent = get_year_progress(today_jst)
     # 残り日数を計算
     remaining_days = total_days - day_num
-    logging.info(f"年の進行状況: {day_num}/{total_days}日 ({percent:.1f}%) - 残り{remaining_days}日")
+    logger.info("年の進行状況: %d/%d日 (%.1f%%) - 残り%d日", day_num, total_days, percent, remaining_days)
 
     # 2. プログレスバーを作成
     progress_bar_str = create_progress_bar(percent) # 例: "[🟩🟩🟩⬜⬜⬜⬜⬜⬜⬜] 27%"
-    logging.info(f"プログレスバー: {progress_bar_str}")
+    logger.info("プログレスバー: %s", progress_bar_str)
 
-    # 3. Gemini API で一文を生成
-    generated_sentence = generate_sentence(GEMINI_API_KEY, day_num, total_days, percent)
-    logging.info(f"生成された/代替の文章: {generated_sentence}")
+    # 3. Gemini API で一文を生成 (並行して X API クライアントを準備)
+    generated_sentence, tweet_client = asyncio.run(prepare_sentence_and_client(day_num, total_days, percent))
+    logger.info("生成された/代替の文章: %s", generated_sentence)
 
     # 4. ツイート本文を組み立て
     # 曜日を日本語で取得
-    weekdays_jp = ["月", "火", "水", "木", "金", "土", "日"]
-    weekday_jp = weekdays_jp[now_jst.weekday()]
+    weekday_jp = WEEKDAYS_JP[now_jst.weekday()]
 
     # 新しいテンプレートに合わせてフォーマット (残り日数表示を追加)
-    tweet_text = (
-        f"==============================\n"
-        f"【 本日は{now_jst.year}年{now_jst.month}月{now_jst.day}日({weekday_jp}) 】\n\n"
-        f"経過：{day_num}日 / {total_days}日（残り{remaining_days}日）\n"
-        f"進捗：{progress_bar_str}\n\n"
-        f"{generated_sentence}"
-        f"==============================\n"
-    )
-    logging.info(f"生成されたツイート本文:\n{tweet_text}")
+    tweet_text = "\n".join([
+        TWEET_BANNER,
+        f"【 本日は{now_jst.year}年{now_jst.month}月{now_jst.day}日({weekday_jp}) 】",
+        "",
+        f"経過：{day_num}日 / {total_days}日（残り{remaining_days}日）",
+        f"進捗：{progress_bar_str}",
+        "",
+        generated_sentence,
+        TWEET_BANNER,
+    ])
+    logger.info("生成されたツイート本文:\n%s", tweet_text)
 
     # 5. Xにツイート投稿
-    logging.info("ツイート投稿処理を開始します...")
-    success = post_tweet(
-        api_key=X_API_KEY,
-        api_secret=X_API_SECRET,
-        access_token=X_ACCESS_TOKEN,
-        access_token_secret=X_ACCESS_TOKEN_SECRET,
-        text=tweet_text
-    )
+    logger.info("ツイート投稿処理を開始します...")
+    success = post_tweet(client=tweet_client, text=tweet_text)
 
     if success:
-        logging.info("ツイート投稿が正常に完了しました。")
+        logger.info("ツイート投稿が正常に完了しました。")
     else:
-        logging.error("ツイート投稿に失敗しました。")
+        logger.error("ツイート投稿に失敗しました。")
         exit(1) # エラー終了
 
-    logging.info("Chrona Bot 処理完了。") 
+    logger.info("Chrona Bot 処理完了。") 